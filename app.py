@@ -3,15 +3,43 @@ Carrier Sales API - HappyRobot Integration
 Flask API for carrier verification and load management
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
+import decimal
+import functools
 import json
+import math
+import orjson
 import os
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import threading
+import time
 import requests
-from typing import Dict, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Tuple
+
+class OrjsonProvider(JSONProvider):
+    """jsonify()/request.get_json() backed by orjson instead of stdlib json."""
+
+    @staticmethod
+    def _default(o):
+        if isinstance(o, decimal.Decimal):
+            return str(o)
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self._default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # ==================== CONFIG ====================
@@ -21,36 +49,494 @@ FMCSA_API_KEY = os.environ.get('FMCSA_API_KEY', '')  # put your FMCSA key in env
 # Files
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOADS_FILE = os.path.join(BASE_DIR, 'loads.json')
-CALLS_DB_FILE = os.path.join(BASE_DIR, 'calls_database.json')
+CALLS_DB_FILE = os.path.join(BASE_DIR, 'calls.db')
+# older storage formats, imported into CALLS_DB_FILE once at startup
+LEGACY_CALLS_LOG_FILE = os.path.join(BASE_DIR, 'calls_database.jsonl')
+LEGACY_CALLS_DB_FILE = os.path.join(BASE_DIR, 'calls_database.json')
 
 # ==================== UTILS ====================
 def load_json_file(filename: str) -> List[Dict]:
     try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
+        with open(filename, 'rb') as f:
+            data = orjson.loads(f.read())
             print(f"[LOAD] {filename} -> {len(data)} records")
             return data
     except FileNotFoundError:
         print(f"[LOAD] {filename} not found -> returning []")
         return []
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"[LOAD] {filename} JSON error: {e} -> returning []")
         return []
 
 def save_json_file(filename: str, data: List[Dict]):
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+
+# Loads are read-mostly: keep the parsed list in memory and only reparse
+# when the file changes. The version is (st_mtime_ns, st_size): mtime
+# alone only advances once per kernel clock tick, so a read that raced an
+# in-place rewrite could otherwise stay cached. The whole entry is swapped
+# at once so a reader never sees loads from one version and an index from
+# another.
+_LOADS_LOCK = threading.Lock()
+
+# Load fields searched by substring.
+INDEXED_FIELDS = ('origin', 'destination', 'equipment_type', 'commodity_type')
+
+def _build_field_index(values: List[str]) -> Tuple[List[str], List[List[int]]]:
+    """
+    Field values repeat heavily across loads (a handful of equipment types,
+    the same lanes over and over), so each field is reduced to its distinct
+    values, with `postings[value_id]` listing the loads carrying each one.
+    """
+    value_ids = {}
+    postings = []
+    for i, val in enumerate(values):
+        vid = value_ids.get(val)
+        if vid is None:
+            vid = value_ids[val] = len(postings)
+            postings.append([])
+        postings[vid].append(i)
+    return list(value_ids), postings
+
+def _field_lookup(field_index: Tuple[List[str], List[List[int]]], query: str) -> set:
+    """Load indices whose field value contains query (a fresh set)."""
+    values, postings = field_index
+    hits = set()
+    # `in` over the distinct values only: small, and no per-suffix index to
+    # build or hold in memory
+    for vid, val in enumerate(values):
+        if query in val:
+            hits.update(postings[vid])
+    return hits
+
+def _build_loads_index(loads: List[Dict]) -> Dict:
+    return {
+        field: _build_field_index([(load.get(field, '') or '').lower() for load in loads])
+        for field in INDEXED_FIELDS
+    }
+
+@functools.lru_cache(maxsize=1024)
+def _split_city_state(val: str) -> Tuple[str, str]:
+    """'Chicago, IL' -> ('chicago', 'il'). Cached: workflows repeat the same lanes."""
+    if ',' in val:
+        parts = [p.strip().lower() for p in val.split(',')]
+        return (parts[0], parts[1]) if len(parts) == 2 else (parts[0], '')
+    return (val.lower(), '')
+
+def _build_id_index(loads: List[Dict]) -> Dict[str, int]:
+    by_id = {}
+    for i, load in enumerate(loads):
+        by_id.setdefault(load.get('load_id'), i)  # first match wins, as in a linear scan
+    return by_id
+
+def _build_loads_cache(version: Optional[Tuple[int, int]], loads: List[Dict]) -> Dict:
+    return {
+        'version': version,
+        'data': loads,
+        'index': _build_loads_index(loads),
+        # normalized once here so the request path never touches raw fields
+        'pickups': [load.get('pickup_datetime', '') or '' for load in loads],
+        'by_id': _build_id_index(loads),
+    }
+
+# Seeded with a fully built empty entry: a missing loads.json (version None)
+# matches it and must still search like an empty file.
+_LOADS_CACHE = _build_loads_cache(None, [])
+
+def _loads_file_version() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(LOADS_FILE)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+def _reload_loads():
+    """Rebuild the cache entry; caller holds _LOADS_LOCK, released here."""
+    global _LOADS_CACHE
+    try:
+        version = _loads_file_version()
+        if version != _LOADS_CACHE['version']:
+            _LOADS_CACHE = _build_loads_cache(version, load_json_file(LOADS_FILE))
+    finally:
+        _LOADS_LOCK.release()
+
+def _get_loads_cache() -> Dict:
+    """
+    Current loads entry. When loads.json has changed, one caller starts a
+    background rebuild and everyone keeps serving the previous entry until
+    the new one is swapped in, so no request waits on the parse.
+    """
+    if _loads_file_version() != _LOADS_CACHE['version'] and _LOADS_LOCK.acquire(blocking=False):
+        try:
+            threading.Thread(target=_reload_loads, daemon=True).start()
+        except Exception:
+            _LOADS_LOCK.release()
+            raise
+    return _LOADS_CACHE
+
+def warm_loads_cache():
+    """Build the loads entry synchronously (startup), off the request path."""
+    _LOADS_LOCK.acquire()
+    _reload_loads()
+
+def loads_etag(cache: Dict) -> str:
+    version = cache['version']
+    return f"loads-{version[0]}-{version[1]}" if version else "loads-none"
+
+# Legacy call files were written by stdlib json, which emits NaN/Infinity;
+# orjson rejects those, so the one-time import reads them with json too.
+def iter_jsonl(filename: str):
+    try:
+        with open(filename, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"[LOAD] {filename} skipping bad line: {e}")
+    except FileNotFoundError:
+        return
+
+# Responses carry millisecond timestamps; format each millisecond once and
+# reuse it. The (ms, text) pair is swapped as one tuple so readers never see
+# a mismatched pair.
+_TS_CACHE = (0, '')
+
+def now_iso() -> str:
+    global _TS_CACHE
+    ms = time.time_ns() // 1_000_000
+    cached_ms, text = _TS_CACHE
+    if ms != cached_ms:
+        text = datetime.fromtimestamp(ms / 1000).isoformat(timespec='milliseconds')
+        _TS_CACHE = (ms, text)
+    return text
 
 def verify_api_key() -> bool:
     return request.headers.get('X-API-Key') == API_KEY
 
+def is_not_modified(etag: str) -> bool:
+    return request.if_none_match.contains_weak(etag)
+
+def not_modified(etag: str) -> Response:
+    resp = Response(status=304)
+    resp.set_etag(etag, weak=True)
+    return resp
+
+def with_etag(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag, weak=True)
+    return resp
+
+# ==================== CALLS DB ====================
+OUTCOME_AGREED = 'agreed'
+OUTCOME_TRANSFERRED = 'transferred'
+SENTIMENT_POSITIVE = 'positive'
+SENTIMENT_NEUTRAL = 'neutral'
+SENTIMENT_NEGATIVE = 'negative'
+
+# The columns next to `payload` are the ones analytics and listing filter or
+# aggregate on; the full record is kept as JSON in `payload`.
+CALLS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls(
+    id TEXT,
+    timestamp TEXT,
+    outcome TEXT,
+    sentiment TEXT,
+    negotiation_rounds INT,
+    agreed_rate REAL,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_timestamp ON calls(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_calls_outcome ON calls(outcome);
+CREATE INDEX IF NOT EXISTS idx_calls_sentiment ON calls(sentiment);
+CREATE TABLE IF NOT EXISTS call_stats(
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INT,
+    agreed INT,
+    transferred INT,
+    positive INT,
+    neutral INT,
+    negative INT,
+    rounds_sum REAL,
+    rate_sum REAL
+);
+"""
+
+# Analytics counters over the whole calls table, kept in the single
+# call_stats row so /api/analytics never scans calls.
+RECOMPUTE_STATS_SQL = f"""
+INSERT OR REPLACE INTO call_stats
+SELECT 1, COUNT(*),
+       COUNT(*) FILTER (WHERE outcome = '{OUTCOME_AGREED}'),
+       COUNT(*) FILTER (WHERE outcome = '{OUTCOME_TRANSFERRED}'),
+       COUNT(*) FILTER (WHERE sentiment = '{SENTIMENT_POSITIVE}'),
+       COUNT(*) FILTER (WHERE sentiment = '{SENTIMENT_NEUTRAL}'),
+       COUNT(*) FILTER (WHERE sentiment = '{SENTIMENT_NEGATIVE}'),
+       TOTAL(negotiation_rounds), TOTAL(agreed_rate)
+FROM calls
+"""
+
+UPDATE_STATS_SQL = """
+UPDATE call_stats SET
+    total = total + 1,
+    agreed = agreed + ?, transferred = transferred + ?,
+    positive = positive + ?, neutral = neutral + ?, negative = negative + ?,
+    rounds_sum = rounds_sum + ?, rate_sum = rate_sum + ?
+WHERE id = 1
+"""
+
+def connect_calls_db() -> sqlite3.Connection:
+    return sqlite3.connect(CALLS_DB_FILE, timeout=10)
+
+def get_calls_db() -> sqlite3.Connection:
+    """Per-request connection, closed on app context teardown."""
+    if 'calls_db' not in g:
+        g.calls_db = connect_calls_db()
+    return g.calls_db
+
+@app.teardown_appcontext
+def close_calls_db(error=None):
+    db = g.pop('calls_db', None)
+    if db is not None:
+        db.close()
+
+INSERT_CALL_SQL = (
+    'INSERT INTO calls(id, timestamp, outcome, sentiment, negotiation_rounds, agreed_rate, payload) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?)'
+)
+
+def _finite(value):
+    # legacy records may hold NaN/Infinity; keep them out of the running sums
+    return 0 if isinstance(value, float) and not math.isfinite(value) else value
+
+def _call_row(data: Dict) -> tuple:
+    return (data.get('id'), data.get('timestamp', ''), data.get('outcome'),
+            data.get('sentiment', SENTIMENT_NEUTRAL), _finite(data.get('negotiation_rounds', 0) or 0),
+            _finite(data.get('agreed_rate', 0) or 0), orjson.dumps(data).decode())
+
+def insert_call(db: sqlite3.Connection, data: Dict):
+    """Insert one call and bump call_stats; run inside the caller's transaction."""
+    row = _call_row(data)
+    _, _, outcome, sentiment, rounds, rate, _ = row
+    db.execute(INSERT_CALL_SQL, row)
+    db.execute(UPDATE_STATS_SQL, (
+        outcome == OUTCOME_AGREED, outcome == OUTCOME_TRANSFERRED,
+        sentiment == SENTIMENT_POSITIVE, sentiment == SENTIMENT_NEUTRAL, sentiment == SENTIMENT_NEGATIVE,
+        rounds, rate,
+    ))
+
+def _load_legacy_calls_file(filename: str) -> List[Dict]:
+    """
+    Unlike load_json_file, a parse error raises: the import only runs into an
+    empty table, so quietly importing nothing would lose the history for good.
+    """
+    with open(filename, 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{filename}: expected a JSON array of calls")
+    return data
+
+def _legacy_calls():
+    if os.path.exists(LEGACY_CALLS_LOG_FILE):
+        source, calls = LEGACY_CALLS_LOG_FILE, iter_jsonl(LEGACY_CALLS_LOG_FILE)
+    elif os.path.exists(LEGACY_CALLS_DB_FILE):
+        source, calls = LEGACY_CALLS_DB_FILE, _load_legacy_calls_file(LEGACY_CALLS_DB_FILE)
+    else:
+        return
+    for call in calls:
+        if not isinstance(call, dict):
+            print(f"[MIGRATE] {source} skipping non-object record: {call!r}")
+            continue
+        yield call
+
+def init_calls_db():
+    """Create the schema and import legacy JSON/JSONL calls into an empty table."""
+    db = connect_calls_db()
+    try:
+        db.execute('PRAGMA journal_mode=WAL')  # readers don't block the writer
+        db.executescript(CALLS_SCHEMA)
+        # IMMEDIATE takes the write lock up front so only one worker migrates
+        db.execute('BEGIN IMMEDIATE')
+        if db.execute('SELECT 1 FROM calls LIMIT 1').fetchone() is None:
+            # A bad legacy file must not stop workers from booting: undo any
+            # partial import and keep starting up, but say so loudly.
+            db.execute('SAVEPOINT legacy_import')
+            try:
+                # single streamed pass: rows go straight from the file into SQLite
+                imported = db.executemany(INSERT_CALL_SQL, (_call_row(c) for c in _legacy_calls())).rowcount
+            except Exception as e:
+                db.execute('ROLLBACK TO legacy_import')
+                imported = 0
+                print(f"[MIGRATE] ERROR: legacy calls NOT imported: {e!r}. "
+                      f"Fix the file and restart before new calls are recorded.")
+            db.execute('RELEASE legacy_import')
+            if imported > 0:
+                print(f"[MIGRATE] legacy calls -> {CALLS_DB_FILE} ({imported} records)")
+                db.execute(RECOMPUTE_STATS_SQL)
+        # databases created before call_stats existed get a one-time recompute
+        if db.execute('SELECT 1 FROM call_stats WHERE id = 1').fetchone() is None:
+            db.execute(RECOMPUTE_STATS_SQL)
+        db.commit()
+    finally:
+        db.close()
+
+# ==================== FMCSA ====================
+# Carrier data changes slowly: remember lookups (including "not found") per
+# MC number for a day. Errors are never cached.
+FMCSA_CONNECT_TIMEOUT = 6
+FMCSA_READ_TIMEOUT = 6
+FMCSA_RETRIES = 2
+FMCSA_BACKOFF = 0.2
+# Worst case for one lookup: every attempt spends both timeouts, plus the
+# urllib3 backoff sleeps between attempts (and a second of slack).
+FMCSA_LOOKUP_BUDGET = (
+    (FMCSA_CONNECT_TIMEOUT + FMCSA_READ_TIMEOUT) * (FMCSA_RETRIES + 1)
+    + sum(FMCSA_BACKOFF * 2 ** i for i in range(FMCSA_RETRIES))
+    + 1
+)
+FMCSA_CACHE_TTL = 24 * 3600
+FMCSA_CACHE_SIZE = 50_000
+_FMCSA_CACHE = OrderedDict()  # mc_number -> (expires_at, carrier_data|None)
+_FMCSA_INFLIGHT = {}  # mc_number -> Event set when the pending lookup finishes
+_FMCSA_LOCK = threading.Lock()
+
+# One pooled session so verifications reuse kept-alive TLS connections
+# instead of handshaking with FMCSA on every call.
+_FMCSA_SESSION = requests.Session()
+_FMCSA_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=50,
+    pool_maxsize=200,
+    max_retries=Retry(total=FMCSA_RETRIES, backoff_factor=FMCSA_BACKOFF),
+))
+_FMCSA_SESSION.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': 'gzip'})
+
+def _request_fmcsa(mc_number: str) -> Tuple[Optional[Dict], bool]:
+    """Call FMCSA once. Returns (carrier_data|None, cacheable)."""
+    url = f"https://mobile.fmcsa.dot.gov/qc/services/carriers/{mc_number}"
+    params = {"webKey": FMCSA_API_KEY} if FMCSA_API_KEY else {}
+
+    r = _FMCSA_SESSION.get(url, params=params, timeout=(FMCSA_CONNECT_TIMEOUT, FMCSA_READ_TIMEOUT))
+    # best-effort JSON parse
+    try:
+        data = r.json()
+    except ValueError:
+        data = {}
+
+    if not isinstance(data, dict):
+        data = {}
+
+    content = data.get("content")
+    carrier = None
+
+    # FMCSA responses can be dict or list under "content"
+    if isinstance(content, dict):
+        carrier = content.get("carrier") or content
+    elif isinstance(content, list) and content and isinstance(content[0], dict):
+        carrier = content[0].get("carrier") or content[0]
+
+    carrier_data = None
+    if isinstance(carrier, dict):
+        carrier_data = {
+            "mc_number": mc_number,
+            "legal_name": carrier.get("legalName") or carrier.get("name") or "Unknown",
+            "dot_number": carrier.get("dotNumber") or "N/A",
+            "city": carrier.get("phyCity") or "N/A",
+            "state": carrier.get("phyState") or "N/A",
+        }
+
+    # don't pin a 24h "not found" on an FMCSA outage page
+    return carrier_data, carrier_data is not None or r.ok
+
+def _fmcsa_cache_get(mc_number: str) -> Tuple[bool, Optional[Dict]]:
+    # caller holds _FMCSA_LOCK
+    hit = _FMCSA_CACHE.get(mc_number)
+    if hit and hit[0] > time.monotonic():
+        _FMCSA_CACHE.move_to_end(mc_number)
+        return True, hit[1]
+    return False, None
+
+def _fetch_fmcsa_uncached(mc_number: str) -> Optional[Dict]:
+    carrier_data, cacheable = _request_fmcsa(mc_number)
+    if cacheable:
+        with _FMCSA_LOCK:
+            _FMCSA_CACHE[mc_number] = (time.monotonic() + FMCSA_CACHE_TTL, carrier_data)
+            _FMCSA_CACHE.move_to_end(mc_number)
+            while len(_FMCSA_CACHE) > FMCSA_CACHE_SIZE:
+                _FMCSA_CACHE.popitem(last=False)
+    return carrier_data
+
+def _fetch_fmcsa(mc_number: str) -> Optional[Dict]:
+    """
+    Return normalized carrier_data for mc_number, or None if FMCSA has no carrier.
+    Network errors propagate to the caller and are not cached. Concurrent
+    misses for the same MC number share a single FMCSA request.
+    """
+    with _FMCSA_LOCK:
+        found, carrier_data = _fmcsa_cache_get(mc_number)
+        if found:
+            return carrier_data
+        pending = _FMCSA_INFLIGHT.get(mc_number)
+        if pending is None:
+            _FMCSA_INFLIGHT[mc_number] = threading.Event()
+
+    if pending is not None:
+        # the leader always sets the Event in its finally; wait as long as it can take
+        pending.wait(FMCSA_LOOKUP_BUDGET)
+        with _FMCSA_LOCK:
+            found, carrier_data = _fmcsa_cache_get(mc_number)
+        if found:
+            return carrier_data
+        # the shared lookup failed; try on our own so we report our own error
+        return _fetch_fmcsa_uncached(mc_number)
+
+    try:
+        return _fetch_fmcsa_uncached(mc_number)
+    finally:
+        with _FMCSA_LOCK:
+            _FMCSA_INFLIGHT.pop(mc_number).set()
+
+def _verify_carrier_result(mc_number: str) -> Tuple[Dict, bool]:
+    """Verification body for one MC number, and whether it may be cached downstream."""
+    try:
+        carrier_data = _fetch_fmcsa(mc_number)
+    except Exception as e:
+        # Strict: on error we DO NOT verify
+        print(f"[ERROR] FMCSA API error: {str(e)}")
+        return {
+            "success": True,
+            "verified": False,
+            "carrier_data": None,
+            "message": f"FMCSA API error: {str(e)}"
+        }, False
+
+    if carrier_data is not None:
+        return {
+            "success": True,
+            "verified": True,
+            "carrier_data": carrier_data,
+            "message": "Carrier verified via FMCSA"
+        }, True
+
+    # Not found
+    return {
+        "success": True,
+        "verified": False,
+        "carrier_data": None,
+        "message": "Carrier not found in FMCSA"
+    }, True
+
 # ==================== ENDPOINTS ====================
+# Bulk endpoints take at most this many items per request, so one call
+# can't fan out into an unbounded number of FMCSA requests.
+BULK_MAX_ITEMS = 100
+BULK_FMCSA_WORKERS = 32
 
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': now_iso(),
         'service': 'Carrier Sales API'
     }), 200
 
@@ -67,60 +553,43 @@ def verify_carrier():
     if not mc_number:
         return jsonify({"success": False, "verified": False, "error": "mc_number required"}), 400
 
-    url = f"https://mobile.fmcsa.dot.gov/qc/services/carriers/{mc_number}"
-    params = {"webKey": FMCSA_API_KEY} if FMCSA_API_KEY else {}
+    result, cacheable = _verify_carrier_result(mc_number)
+    resp = jsonify(result)
+    if cacheable:
+        resp.headers['Cache-Control'] = 'public, max-age=3600'
+        # only served after the API key check: shared caches must key on it
+        resp.headers['Vary'] = 'X-API-Key'
+    return resp, 200
 
-    try:
-        r = requests.get(url, params=params, timeout=6)
-        # best-effort JSON parse
-        try:
-            data = r.json()
-        except ValueError:
-            data = {}
-
-        if not isinstance(data, dict):
-            data = {}
-
-        content = data.get("content")
-        carrier = None
-
-        # FMCSA responses can be dict or list under "content"
-        if isinstance(content, dict):
-            carrier = content.get("carrier") or content
-        elif isinstance(content, list) and content and isinstance(content[0], dict):
-            carrier = content[0].get("carrier") or content[0]
-
-        if isinstance(carrier, dict):
-            return jsonify({
-                "success": True,
-                "verified": True,
-                "carrier_data": {
-                    "mc_number": mc_number,
-                    "legal_name": carrier.get("legalName") or carrier.get("name") or "Unknown",
-                    "dot_number": carrier.get("dotNumber") or "N/A",
-                    "city": carrier.get("phyCity") or "N/A",
-                    "state": carrier.get("phyState") or "N/A",
-                },
-                "message": "Carrier verified via FMCSA"
-            }), 200
+@app.route('/api/verify-carrier/bulk', methods=['POST'])
+def verify_carriers_bulk():
+    """
+    Verify several carriers in one round-trip; FMCSA lookups run concurrently.
+    Body: {"mc_numbers": [str, ...]} (at most BULK_MAX_ITEMS)
+    Results come back in input order.
+    """
+    if not verify_api_key():
+        return jsonify({"error": "Unauthorized"}), 401
 
-        # Not found
-        return jsonify({
-            "success": True,
-            "verified": False,
-            "carrier_data": None,
-            "message": "Carrier not found in FMCSA"
-        }), 200
+    payload = request.get_json(force=True, silent=True) or {}
+    mc_numbers = payload.get("mc_numbers") if isinstance(payload, dict) else None
+    if not isinstance(mc_numbers, list) or not mc_numbers:
+        return jsonify({"success": False, "error": "mc_numbers list required"}), 400
+    if len(mc_numbers) > BULK_MAX_ITEMS:
+        return jsonify({"success": False, "error": f"at most {BULK_MAX_ITEMS} mc_numbers per request"}), 400
 
-    except Exception as e:
-        # Strict: on error we DO NOT verify
-        print(f"[ERROR] FMCSA API error: {str(e)}")
-        return jsonify({
-            "success": True,
-            "verified": False,
-            "carrier_data": None,
-            "message": f"FMCSA API error: {str(e)}"
-        }), 200
+    mc_numbers = [str(mc or "").strip() for mc in mc_numbers]
+
+    def _one(mc_number: str) -> Dict:
+        if not mc_number:
+            return {"mc_number": mc_number, "success": False, "verified": False, "error": "mc_number required"}
+        result, _ = _verify_carrier_result(mc_number)
+        return {"mc_number": mc_number, **result}
+
+    with ThreadPoolExecutor(max_workers=min(BULK_FMCSA_WORKERS, len(mc_numbers))) as pool:
+        results = list(pool.map(_one, mc_numbers))
+
+    return jsonify({"success": True, "count": len(results), "results": results}), 200
 
 @app.route('/api/loads', methods=['GET'])
 def search_loads():
@@ -132,71 +601,117 @@ def search_loads():
     if not verify_api_key():
         return jsonify({"error": "Unauthorized"}), 401
 
-    def _split_city_state(val: str):
-        if ',' in val:
-            parts = [p.strip() for p in val.split(',')]
-            return (parts[0], parts[1]) if len(parts) == 2 else (parts[0], '')
-        return (val, '')
-
     origin = request.args.get('origin', '')
     destination = request.args.get('destination', '')
 
     if origin:
         origin_city, origin_state = _split_city_state(origin)
     else:
-        origin_city = request.args.get('origin_city', '')
-        origin_state = request.args.get('origin_state', '')
+        origin_city = request.args.get('origin_city', '').lower()
+        origin_state = request.args.get('origin_state', '').lower()
 
     if destination:
         destination_city, destination_state = _split_city_state(destination)
     else:
-        destination_city = request.args.get('destination_city', '')
-        destination_state = request.args.get('destination_state', '')
+        destination_city = request.args.get('destination_city', '').lower()
+        destination_state = request.args.get('destination_state', '').lower()
 
-    origin_city = origin_city.lower()
-    origin_state = origin_state.lower()
-    destination_city = destination_city.lower()
-    destination_state = destination_state.lower()
     equipment_type = (request.args.get('equipment_type') or '').lower()
     commodity = (request.args.get('commodity') or '').lower()
     pickup_date = request.args.get('pickup_date')  # keep as substring match (ISO)
 
-    all_loads = load_json_file(LOADS_FILE)
-    print(f"[DEBUG] Reading {LOADS_FILE} -> {len(all_loads)} loads")
-
-    filtered = []
-    for load in all_loads:
-        o = (load.get('origin', '') or '').lower()
-        d = (load.get('destination', '') or '').lower()
-        et = (load.get('equipment_type', '') or '').lower()
-        com = (load.get('commodity_type', '') or '').lower()
-        if origin_city and origin_city not in o: continue
-        if origin_state and origin_state not in o: continue
-        if destination_city and destination_city not in d: continue
-        if destination_state and destination_state not in d: continue
-        if equipment_type and equipment_type not in et: continue
-        if commodity and commodity not in com: continue
-        if pickup_date:
-            if pickup_date not in (load.get('pickup_datetime', '') or ''):
-                continue
-        filtered.append(load)
-
-    return jsonify({
+    cache = _get_loads_cache()
+    all_loads, index, pickups = cache['data'], cache['index'], cache['pickups']
+    # the result only depends on the query string and the loads file version
+    etag = loads_etag(cache)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    # Checks are built once per request (empty and duplicate filters dropped)
+    # so the lookup loop below does no per-filter branching.
+    checks = {(field, token) for field, token in (
+        ('origin', origin_city), ('origin', origin_state),
+        ('destination', destination_city), ('destination', destination_state),
+        ('equipment_type', equipment_type), ('commodity_type', commodity),
+    ) if token}
+
+    # Intersect the hits of every check; None means unfiltered.
+    hit_sets = []
+    for field, token in checks:
+        hits = _field_lookup(index[field], token)
+        if not hits:
+            hit_sets = [hits]
+            break
+        hit_sets.append(hits)
+
+    candidates = None
+    if hit_sets:
+        # one C-level intersection, seeded with the smallest set so the work
+        # is bounded by the most selective filter
+        hit_sets.sort(key=len)
+        candidates = hit_sets[0].intersection(*hit_sets[1:])
+
+    matches = range(len(all_loads)) if candidates is None else sorted(candidates)
+    if pickup_date:
+        matches = [i for i in matches if pickup_date in pickups[i]]
+    filtered = [all_loads[i] for i in matches]
+
+    return with_etag(jsonify({
         'success': True,
         'count': len(filtered),
         'loads': filtered,
-        'timestamp': datetime.now().isoformat()
-    }), 200
+        'timestamp': now_iso()
+    }), etag), 200
 
 @app.route('/api/loads/<load_id>', methods=['GET'])
 def get_load_by_id(load_id):
     if not verify_api_key():
         return jsonify({'error': 'Unauthorized'}), 401
-    all_loads = load_json_file(LOADS_FILE)
-    for load in all_loads:
-        if load.get('load_id') == load_id:
-            return jsonify({'success': True, 'load': load, 'timestamp': datetime.now().isoformat()}), 200
-    return jsonify({'success': False, 'error': 'Load not found', 'timestamp': datetime.now().isoformat()}), 404
+    cache = _get_loads_cache()
+    etag = loads_etag(cache)
+    i = cache['by_id'].get(load_id)
+    if i is not None:
+        if is_not_modified(etag):
+            return not_modified(etag)
+        return with_etag(jsonify({'success': True, 'load': cache['data'][i], 'timestamp': now_iso()}), etag), 200
+    return jsonify({'success': False, 'error': 'Load not found', 'timestamp': now_iso()}), 404
+
+@app.route('/api/loads/bulk', methods=['GET'])
+def get_loads_bulk():
+    """
+    Fetch several loads by id in one round-trip.
+    Query param: ids=LOAD-001,LOAD-002 (at most BULK_MAX_ITEMS)
+    """
+    if not verify_api_key():
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    ids = [i.strip() for i in (request.args.get('ids') or '').split(',') if i.strip()]
+    if not ids:
+        return jsonify({'success': False, 'error': 'ids required', 'timestamp': now_iso()}), 400
+    if len(ids) > BULK_MAX_ITEMS:
+        return jsonify({'success': False, 'error': f'at most {BULK_MAX_ITEMS} ids per request',
+                        'timestamp': now_iso()}), 400
+
+    cache = _get_loads_cache()
+    etag = loads_etag(cache)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    loads, missing = [], []
+    for load_id in ids:
+        i = cache['by_id'].get(load_id)
+        if i is None:
+            missing.append(load_id)
+        else:
+            loads.append(cache['data'][i])
+
+    return with_etag(jsonify({
+        'success': True,
+        'count': len(loads),
+        'loads': loads,
+        'missing': missing,
+        'timestamp': now_iso()
+    }), etag), 200
 
 @app.route('/api/call-results', methods=['POST'])
 def save_call_results():
@@ -227,12 +742,13 @@ def save_call_results():
 
     try:
         data = request.get_json(force=True) or {}
-        data['timestamp'] = datetime.now().isoformat()
-        data['id'] = f"call_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        data['timestamp'] = now_iso()
+        # nanosecond ids: second-resolution ids collided under concurrent posts
+        data['id'] = f"call_{time.time_ns()}"
 
-        calls = load_json_file(CALLS_DB_FILE)
-        calls.append(data)
-        save_json_file(CALLS_DB_FILE, calls)
+        db = get_calls_db()
+        with db:
+            insert_call(db, data)
 
         return jsonify({
             'success': True,
@@ -242,30 +758,27 @@ def save_call_results():
         }), 201
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e), 'timestamp': datetime.now().isoformat()}), 500
+        return jsonify({'success': False, 'error': str(e), 'timestamp': now_iso()}), 500
 
 @app.route('/api/analytics', methods=['GET'])
 def get_analytics():
     if not verify_api_key():
         return jsonify({'error': 'Unauthorized'}), 401
     try:
-        calls = load_json_file(CALLS_DB_FILE)
-        if not calls:
-            return jsonify({'success': True, 'total_calls': 0, 'message': 'No calls recorded yet'}), 200
-
-        total = len(calls)
-        success = sum(1 for c in calls if c.get('outcome') == 'agreed')
-        transferred = sum(1 for c in calls if c.get('outcome') == 'transferred')
-        sentiments = [c.get('sentiment', 'neutral') for c in calls]
-        positive = sentiments.count('positive')
-        neutral = sentiments.count('neutral')
-        negative = sentiments.count('negative')
-        rounds = [c.get('negotiation_rounds', 0) or 0 for c in calls]
-        avg_rounds = (sum(rounds)/len(rounds)) if rounds else 0
-        rates = [c.get('agreed_rate', 0) or 0 for c in calls]
-        avg_rate = (sum(rates)/len(rates)) if rates else 0
-
-        return jsonify({
+        total, success, transferred, positive, neutral, negative, rounds_sum, rate_sum = get_calls_db().execute(
+            'SELECT total, agreed, transferred, positive, neutral, negative, rounds_sum, rate_sum '
+            'FROM call_stats WHERE id = 1'
+        ).fetchone()
+        # every insert bumps total, so it doubles as the stats version
+        etag = f"analytics-{total}"
+        if is_not_modified(etag):
+            return not_modified(etag)
+        if not total:
+            return with_etag(jsonify({'success': True, 'total_calls': 0, 'message': 'No calls recorded yet'}), etag), 200
+        avg_rounds = rounds_sum / total
+        avg_rate = rate_sum / total
+
+        return with_etag(jsonify({
             'success': True,
             'analytics': {
                 'total_calls': total,
@@ -283,45 +796,65 @@ def get_analytics():
                     'avg_agreed_rate': round(avg_rate, 2)
                 }
             },
-            'timestamp': datetime.now().isoformat()
-        }), 200
+            'timestamp': now_iso()
+        }), etag), 200
 
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e), 'timestamp': datetime.now().isoformat()}), 500
+        return jsonify({'success': False, 'error': str(e), 'timestamp': now_iso()}), 500
 
 @app.route('/api/calls', methods=['GET'])
 def get_all_calls():
     if not verify_api_key():
         return jsonify({'error': 'Unauthorized'}), 401
     try:
-        calls = load_json_file(CALLS_DB_FILE)
-        calls.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        # No limit (or limit=0) returns every call; negative values are
+        # rejected rather than silently meaning "all".
         limit = request.args.get('limit', type=int)
-        if limit:
-            calls = calls[:limit]
-        return jsonify({'success': True, 'count': len(calls), 'calls': calls, 'timestamp': datetime.now().isoformat()}), 200
+        if limit is not None and limit < 0:
+            return jsonify({'success': False, 'error': 'limit must be >= 0',
+                            'timestamp': now_iso()}), 400
+        rows = get_calls_db().execute(
+            'SELECT payload FROM calls ORDER BY timestamp DESC, rowid LIMIT ?',
+            (limit or -1,),
+        )
+
+        # Stream straight from the cursor: payloads are already JSON text, so
+        # only one row is held at a time and nothing is re-encoded.
+        def generate():
+            yield '{"success":true,"calls":['
+            count = 0
+            for (payload,) in rows:
+                yield payload if count == 0 else ',' + payload
+                count += 1
+            yield '],"count":%d,"timestamp":%s}' % (count, orjson.dumps(now_iso()).decode())
+
+        return Response(stream_with_context(generate()), status=200, mimetype='application/json')
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e), 'timestamp': datetime.now().isoformat()}), 500
+        return jsonify({'success': False, 'error': str(e), 'timestamp': now_iso()}), 500
 
 # ==================== ERROR HANDLERS ====================
 @app.errorhandler(404)
 def not_found(error):
-    return jsonify({'error': 'Endpoint not found', 'timestamp': datetime.now().isoformat()}), 404
+    return jsonify({'error': 'Endpoint not found', 'timestamp': now_iso()}), 404
 
 @app.errorhandler(500)
 def internal_error(error):
-    return jsonify({'error': 'Internal server error', 'timestamp': datetime.now().isoformat()}), 500
+    return jsonify({'error': 'Internal server error', 'timestamp': now_iso()}), 500
 
 # ==================== ALIASES ====================
 @app.route('/api/save-call-results', methods=['POST'])
 def save_call_results_alias():
     return save_call_results()
 
+# ==================== STARTUP ====================
+# runs on import so gunicorn workers initialize too; safe to repeat
+init_calls_db()
+warm_loads_cache()
+
 # ==================== MAIN ====================
 if __name__ == '__main__':
     if not os.path.exists(LOADS_FILE):
         save_json_file(LOADS_FILE, [])
-    if not os.path.exists(CALLS_DB_FILE):
-        save_json_file(CALLS_DB_FILE, [])
     port = int(os.environ.get('PORT', 5160))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    # the reloader/debugger are opt-in; never on by default
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG') == '1')
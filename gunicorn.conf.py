@@ -0,0 +1,15 @@
+"""
+Gunicorn config for production.
+verify_carrier blocks on the FMCSA API, so workers run gevent: the worker
+monkey-patches sockets itself and each request waits on its own greenlet
+instead of holding an OS thread.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = 'gevent'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_connections = 1000
+timeout = 30